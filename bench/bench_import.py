@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Compares supply import throughput of the CSV table reader against the JSON
+# configuration parser for the same set of supplies.
+#
+# usage: python bench/bench_import.py [rows] [groups]
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eagle-gensupply.py")
+
+spec = importlib.util.spec_from_file_location("gensupply", SCRIPT)
+gensupply = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gensupply)
+
+STYLES = ("F+", "F-", "GND", "A1", "T2+")
+
+def rows (count, groups):
+    for i in range(count):
+        yield (f"g{i % groups}", f"S{i}", STYLES[i % len(STYLES)], f"Group {i % groups}")
+
+def writeTable (fn, count, groups):
+    with open(fn, 'w', newline="") as fd:
+        fd.write("group,name,style,title\n")
+        for row in rows(count, groups):
+            fd.write(",".join(row) + "\n")
+
+def writeJson (fn, count, groups):
+    data = {"groups" : {}}
+    for group, name, style, title in rows(count, groups):
+        data["groups"].setdefault(group, {"title" : title, "supplies" : []})["supplies"].append({"name" : name, "style" : style})
+    with open(fn, 'w') as fd:
+        json.dump(data, fd)
+
+def timeit (label, count, parse):
+    start = time.perf_counter()
+    config = parse()
+    elapsed = time.perf_counter() - start
+    parsed = sum(len(i._supplies) for i in config.groups)
+    assert parsed == count, f"{label}: parsed {parsed} of {count} supplies"
+    print(f"{label:6} {count:9d} supplies {elapsed:8.3f}s {count / elapsed:12.0f} supplies/s")
+
+def main ():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    groups = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        table = os.path.join(tmp, "supplies.csv")
+        config = os.path.join(tmp, "supplies.json")
+        writeTable(table, count, groups)
+        writeJson(config, count, groups)
+        
+        def parseTable ():
+            with gensupply.Config.openTable(table) as fd:
+                return gensupply.Config.parseTable(fd, tmp)
+        
+        def parseJson ():
+            with open(config, 'r') as fd:
+                return gensupply.Config.parse(fd, tmp)
+        
+        timeit("csv", count, parseTable)
+        timeit("json", count, parseJson)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import traceback
 import json
+import csv
+import time
 import argparse
 import sys
 import os
@@ -9,6 +11,14 @@ from collections.abc import Iterable
 from itertools import chain
 from io import StringIO
 import html
+import math
+from urllib.parse import quote
+import zlib
+import re
+import hashlib
+import fnmatch
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 
 COMMAND_DOC_EXAMPLES="""
 === Example: Supply File Example ===
@@ -19,6 +29,10 @@ example.json
 >>  {
 >>      "prefix" : "sup2_",               // Optional
 >>      "output" : "~/EAGLE/lbr/",        // Optional
+>>      "shard"  : {"supplies" : 2000},   // Optional, or {"bytes" : N}
+>>      "rules"  : [                      // Optional, used with --scan
+>>          {"match":"+*V*", "style":"F+", "group":"absolute"}
+>>      ],
 >>      "groups" : {
 >>          "symbolic" : {
 >>              "title" : "Supply: Symbolic",
@@ -39,10 +53,29 @@ example.json
 >>                  {"name":"-5V",        "style":"F-"}
 >>              ]
 >>          },
+>>          "board": {
+>>              "include" : "common.json#rails",  // Group from another file
+>>              "supplies": [
+>>                  {"name":"+12V",       "style":"F+"}
+>>              ]
+>>          },
 >>      }
 >>  }
 """
 
+COMMAND_DOC_TABLE="""
+=== Example: Supply Table Example ===
+
+eagle-gensupply.py example.csv --out path/to/output
+
+example.csv (or tab separated with a .tsv extension)
+>>  group,name,style,title
+>>  symbolic,Gnd,F-,Supply: Symbolic
+>>  symbolic,Vdd,F+,
+>>  absolute,+3V3,F+,Supply: Absolute Common
+>>  absolute,-3V3,F-,
+"""
+
 COMMAND_DOC_INFO="""
 === Developer ===
 
@@ -430,52 +463,71 @@ SUPPLY_SYM_ALIAS = {
     "FLAT:DOWN"         : ("FLAT-", "F-"),
 }
 
+SUPPLY_SYM_STYLES = tuple(sorted(SUPPLY_SYM_TEMPLATES.keys()))
+
 COMMAND_DOC_STYLES="""
 === Available Styles ===
 {styles}
 """.format(
     styles="".join(["  {:2d}) {:20s} (aliases: {})\n".format(
         idx, i, ("N/A" if (i not in SUPPLY_SYM_ALIAS) else ", ".join(SUPPLY_SYM_ALIAS[i]))
-    ) for idx,i in enumerate(sorted(SUPPLY_SYM_TEMPLATES.keys()))])
+    ) for idx,i in enumerate(SUPPLY_SYM_STYLES)])
 )
 
-COMMAND_DOC=COMMAND_DOC_EXAMPLES+COMMAND_DOC_STYLES+COMMAND_DOC_INFO
+COMMAND_DOC=COMMAND_DOC_EXAMPLES+COMMAND_DOC_TABLE+COMMAND_DOC_STYLES+COMMAND_DOC_INFO
 
 DEFAULT_FILE_PATH="~/EAGLE/libraries"
 
-# Add Aliases
-for k,v in SUPPLY_SYM_ALIAS.items():
-    orig = SUPPLY_SYM_TEMPLATES[k]
-    for i in v:
-        SUPPLY_SYM_TEMPLATES[i] = orig
+# Add Aliases. The tables are read-only so concurrent generations can share them.
+SUPPLY_SYM_TEMPLATES = types.MappingProxyType({
+    **SUPPLY_SYM_TEMPLATES,
+    **{alias : SUPPLY_SYM_TEMPLATES[k] for k,v in SUPPLY_SYM_ALIAS.items() for alias in v}
+})
+SUPPLY_SYM_ALIAS = types.MappingProxyType(SUPPLY_SYM_ALIAS)
 
 class L:
-    DEBUG = False
-    @staticmethod
-    def _log (level, msg, context = None):
+    def __init__ (self, debug = False, stream = None):
+        self.debug = debug
+        self.stream = stream if stream is not None else sys.stderr
+    
+    def _log (self, level, msg, context = None):
         prefix = f"[{level:7} {context.contextName}]" if context is not None else f"[{level:8}]"
         lines = msg.split("\n")
         for idx, i in enumerate(lines):
             if idx == len(lines)-1 and i == "":
                 break
-            sys.stderr.write(f"{prefix} {i}\n")
+            self.stream.write(f"{prefix} {i}\n")
         
-    @staticmethod
-    def e (msg, context = None):
-        L._log("Error", msg, context)
+    def e (self, msg, context = None):
+        self._log("Error", msg, context)
         
-    @staticmethod
-    def w (msg, context = None):
-        L._log("Warning", msg, context)
+    def w (self, msg, context = None):
+        self._log("Warning", msg, context)
         
-    @staticmethod
-    def i (msg, context = None):
-        L._log("Info", msg, context)
+    def i (self, msg, context = None):
+        self._log("Info", msg, context)
         
-    @staticmethod
-    def d (msg, context = None):
-        if L.DEBUG:
-            L._log("Debug", msg, context)
+    def d (self, msg, context = None):
+        if self.debug:
+            self._log("Debug", msg, context)
+
+# Everything that may differ between two generations running in the same
+# process: logging, options and caches. Configurations (and their groups and
+# supplies) reach it through Config.run.
+class Run:
+    def __init__ (self, debug = False, overwrite = False, update = False, stream = None, collect = False):
+        self.log = L(debug, stream)
+        self.overwrite = overwrite
+        self.update = update
+        self.workspace = Workspace(self)
+        self.errors = [] if collect else None
+    
+    # Raises the error, or records it and lets the caller carry on when
+    # collecting every problem in one pass.
+    def fail (self, error):
+        if self.errors is None:
+            raise error
+        self.errors.append(error)
 
 class Util:
     @staticmethod
@@ -489,15 +541,20 @@ class Util:
     def escape2 (esc):
         return esc.replace("\"", "&quot;")
 
+    @staticmethod
+    def listItems (items):
+        return "".join(["&lt;li&gt;" + Util.escape(i, True) + "&lt;/li&gt;" for i in items])
+
 class EagleGenError(ValueError): 
     def __init__ (self, msg, *args, context = None, **kwargs):
         super().__init__(msg,*args, **kwargs)
         self.msg = msg
         self.context = context
-        L.d(msg, context)
+        if context is not None:
+            context.run.log.d(msg, context)
         
     def __str__ (self):
-        return f"{self.__class__.__name__}: {self.msg} [Context = {context.contextName}]" if context is not None else f"{self.__class__.__name__}: {self.msg}"
+        return f"{self.__class__.__name__}: {self.msg} [Context = {self.context.contextName}]" if self.context is not None else f"{self.__class__.__name__}: {self.msg}"
     
 class ValidationError(EagleGenError): pass
 class FileAlreadyExists(EagleGenError): pass
@@ -509,20 +566,23 @@ class Supply:
         self.style = style
         
         if self.style not in SUPPLY_SYM_TEMPLATES:
-            raise ValidationError("Supply " + self.name + " requested symbol style " + self.symbol + " which does not exist.", context = self)
+            raise ValidationError("Supply " + self.name + " requested symbol style " + self.style + " which does not exist.", context = self)
             
-        L.d(f"Creating supply {self.name}.", self)
+        self.run.log.d(f"Creating supply {self.name}.", self)
     
     @property
     def symbolData (self):
-        L.d(f"Generating supply symbol using style '{self.style}'.", self)
-        
-        sup_name = self.name
+        self.run.log.d(f"Generating supply symbol using style '{self.style}'.", self)
+        return Supply.symbolFor(self.style, self.name)
+    
+    @staticmethod
+    def symbolFor (style, name):
+        sup_name = name
         sup_name_quote  = Util.escape2(sup_name)
         sup_name_esc    = Util.escape(sup_name)
         sup_name_esc2   = Util.escape(sup_name, True)
 
-        return SUPPLY_SYM_TEMPLATES[self.style].format(
+        return SUPPLY_SYM_TEMPLATES[style].format(
             supply=sup_name_quote,
             supply_esc=sup_name_esc,
             supply_esc2=sup_name_esc2,
@@ -531,7 +591,7 @@ class Supply:
     
     @property
     def deviceData (self):
-        L.d(f"Generating device.", self)
+        self.run.log.d(f"Generating device.", self)
         
         sup_name        = self.name
         sup_name_quote  = Util.escape2(sup_name)
@@ -548,6 +608,10 @@ class Supply:
     @property
     def contextName (self):
         return self.parent.contextName + ":" + self.name
+    
+    @property
+    def run (self):
+        return self.parent.run
         
     def _clone (self, newParent):
         return Supply(newParent, self.name, self.style)
@@ -557,10 +621,12 @@ class Group:
         self.parent = parent
         self.name = name
         self.title = title
-        self.include = None
+        self._include = None
+        self._foreign = None
+        self.shard = None
         self._supplies = {}
         
-        L.d(f"Creating group {self.name}.", self)
+        self.run.log.d(f"Creating group {self.name}.", self)
         
     def createSupply (self, name, style):
         if name  in self._supplies:
@@ -574,6 +640,27 @@ class Group:
         self._supplies[name] = Supply(self, name, style)
         return self._supplies[name]"""
         
+    @property
+    def include (self):
+        # Groups in other configurations are only resolved, and their file
+        # loaded, once something actually needs their supplies.
+        if self._foreign is not None:
+            path, name = self._foreign
+            config = self.run.workspace.load(path, self)
+            
+            if name not in config._groups:
+                raise ValidationError(f"Group includes signals from group '{name}' in '{path}' but no such group exists.", context = self)
+            
+            self._include = config._groups[name]
+            self._foreign = None
+            self.run.log.d(f"Includes group '{self._include.contextName}'.", self)
+        return self._include
+    
+    @include.setter
+    def include (self, group):
+        self._include = group
+        self._foreign = None
+    
     @property
     def supplies (self):
         groupsVisited = []
@@ -589,10 +676,10 @@ class Group:
         if self.include is None:
             return localSupplies
         
-        L.d(f"Imports {self.include.contextName} supplies.", self)
+        self.run.log.d(f"Imports {self.include.contextName} supplies.", self)
         
         if self in groupVisited:
-            stack = "".join(map(groupVisited, lambda x: f"    x.name\n"))
+            stack = "".join(f"    {x.contextName}\n" for x in groupVisited)
             raise ValidationError(f"Circular inclusion of group.\nStack:\n{stack}", context = self)
             
         groupVisited.append(self)
@@ -604,48 +691,347 @@ class Group:
     def contextName (self):
         return self.parent.contextName + ":" + self.name
     
+    @property
+    def run (self):
+        return self.parent.run
+    
     def validate (self):
-        L.d("Validating group.", self)
-        names = []
+        self.run.log.d("Validating group.", self)
+        names = set()
         for supply in self.supplies:
             if supply.name in names:
-                raise ValidationError(f"Supply '{supply.name}' already defined in '{supply.contextName}'.", context = self)
-            names.append(supply.name)
+                self.run.fail(ValidationError(f"Supply '{supply.name}' already defined in '{supply.contextName}'.", context = self))
+            names.add(supply.name)
     
-    def write (self):
-        fn = self.filename
+    def _render (self, supplies, title, items):
+        params = {}
         
-        L.d(f"Generating library '{fn}'.", self)
+        params['items'] = Util.listItems(items)
+        params['title'] = title
+        params['title_esc'] = Util.escape(params['title'], True)
         
+        symbols = StringIO()
+        devices = StringIO()
+        
+        for supply in supplies:
+            symbols.write(supply.symbolData)
+            devices.write(supply.deviceData)
+            
+        return FILE_TEMPLATE.format(symbols=symbols.getvalue(),devices=devices.getvalue(), **params)
+    
+    def _library (self, fn, supplies, title, items, context):
+        if self.run.update and os.path.exists(fn):
+            self.run.log.d(f"Updating generated symbols in '{fn}'.", context)
+            with open(fn, 'r') as fd:
+                return LibraryUpdate(fd, supplies, items, context).run()
+        return self._render(supplies, title, items)
+    
+    def _checkFile (self, fn, data, context):
+        # Returns whether fn needs writing, raising if it may not be replaced.
         if os.path.exists(fn):
-            if not self.parent.overwrite:
-                raise FileAlreadyExists(f"File '{fn}' already exists. Use --force to overwrite.", context=self)
+            with open(fn, 'r') as fd:
+                if fd.read() == data:
+                    self.run.log.d(f"Library '{fn}' is unchanged.", context)
+                    return False
+            if not self.run.overwrite and not self.run.update:
+                raise FileAlreadyExists(f"File '{fn}' already exists. Use --force to overwrite.", context=context)
+        return True
+    
+    def _writeFile (self, fn, data, context):
+        if not self._checkFile(fn, data, context):
+            return False
         
         with open(fn, 'w') as fd:
-            params = {}
-            
-            params['items'] = "".join(["&lt;li&gt;" + Util.escape(i, True) + "&lt;/li&gt;" for i in self._supplies.keys()])
-            params['title'] = self.title
-            params['title_esc'] = Util.escape(params['title'], True)
+            fd.write(data)
+        return True
+    
+    @property
+    def shardLimit (self):
+        return self.shard if self.shard is not None else self.parent.shard
+    
+    @property
+    def shards (self):
+        limit = self.shardLimit
+        if limit is None:
+            return []
+        
+        supplies = list(self.supplies)
+        
+        if "supplies" in limit:
+            budget = limit["supplies"]
+            sizes = {i.name : 1 for i in supplies}
+        else:
+            budget = limit["bytes"]
+            sizes = {i.name : len(i.symbolData) + len(i.deviceData) for i in supplies}
+        
+        # Use a power of two shard count so that growing a group only
+        # reshuffles supplies when the count doubles. Keep doubling until
+        # the largest shard fits the budget; a single supply larger than
+        # the budget gets a shard of its own. Names whose hashes collide
+        # can't be separated, so stop at twice the number of supplies.
+        limitCount = 1
+        while limitCount < 2 * len(supplies):
+            limitCount *= 2
+        
+        count = 1
+        while True:
+            occupied = {}
+            for supply in supplies:
+                occupied.setdefault(Shard.assign(supply.name, count), []).append(supply)
             
-            symbols = StringIO()
-            devices = StringIO()
+            oversized = [i for i in occupied.values() if len(i) > 1 and sum(sizes[j.name] for j in i) > budget]
+            if len(oversized) == 0:
+                break
+            if count >= limitCount:
+                for i in oversized:
+                    self.run.log.w(f"Shard with {', '.join(j.name for j in i)} exceeds the shard limit.", self)
+                break
+            count *= 2
+        
+        shards = []
+        for position, idx in enumerate(sorted(occupied.keys())):
+            shard = Shard(self, idx, position, len(occupied))
+            shard._supplies = occupied[idx]
+            shards.append(shard)
+        
+        self.run.log.d(f"Splitting {len(supplies)} supplies into {len(shards)} of {count} shards.", self)
+        
+        return shards
+    
+    @property
+    def indexFilename (self):
+        return self.parent._makeFileName(self.name, ".index.json")
+    
+    def write (self):
+        if self.shardLimit is not None:
+            return self._writeShards()
+        
+        fn = self.filename
+        
+        self.run.log.d(f"Generating library '{fn}'.", self)
+        
+        previous = self._previousShards()
+        
+        self._writeFile(fn, self._library(fn, self.supplies, self.title, self._supplies.keys(), self), self)
+        
+        # The group used to be sharded; its shards and index are now stale.
+        if previous is not None:
+            self._removeShards(previous, [])
+            self.run.log.i(f"Removing shard index '{self.indexFilename}'.")
+            os.remove(self.indexFilename)
+    
+    def _previousShards (self):
+        fn = self.indexFilename
+        if not os.path.exists(fn):
+            return None
+        
+        with open(fn, 'r') as fd:
+            try:
+                return json.load(fd).get("shards", [])
+            except json.JSONDecodeError:
+                raise ValidationError(f"Shard index '{fn}' is malformed.", context = self)
+    
+    def _removeShards (self, previous, keep):
+        # Shards listed in the previous index but not in the new one would
+        # otherwise leave duplicate devicesets behind in Eagle.
+        for name in previous:
+            path = os.path.join(os.path.dirname(self.indexFilename), os.path.basename(name))
+            if name not in keep and os.path.exists(path):
+                self.run.log.i(f"Removing stale shard '{path}'.")
+                os.remove(path)
+    
+    def _writeShards (self):
+        shards = self.shards
+        previous = self._previousShards()
+        index = {}
+        
+        files = []
+        for shard in shards:
+            files.append((shard.filename, shard.render(), shard))
+            for supply in shard.supplies:
+                index[supply.name] = os.path.basename(shard.filename)
+        
+        fn = self.indexFilename
+        self.run.log.d(f"Generating shard index '{fn}'.", self)
+        
+        files.append((fn, json.dumps({
+            "group"     : self.name,
+            "shards"    : [os.path.basename(i.filename) for i in shards],
+            "supplies"  : index
+        }, indent=4, sort_keys=True) + "\n", self))
+        
+        # Check every file before touching any, so a refused overwrite
+        # leaves the previous shards and index intact.
+        pending = [(path, data, context) for path, data, context in files if self._checkFile(path, data, context)]
+        
+        for path, data, context in pending:
+            with open(path, 'w') as fd:
+                fd.write(data)
+            if context is not self:
+                self.run.log.i(f"Wrote shard '{path}' ({len(context.supplies)} supplies).")
+        
+        if previous is not None:
+            self._removeShards(previous, [os.path.basename(i.filename) for i in shards])
+
+
+class Shard:
+    def __init__ (self, parent, index, position, count):
+        self.parent = parent
+        self.index = index
+        self.position = position
+        self.count = count
+        self._supplies = []
+    
+    @staticmethod
+    def assign (name, count):
+        # crc32 is stable across runs (unlike hash()) so a supply stays in
+        # the same shard between incremental rebuilds.
+        return zlib.crc32(name.encode("utf-8")) % count
+    
+    @property
+    def supplies (self):
+        return self._supplies
+    
+    @property
+    def filename (self):
+        return self.parent.parent._makeFileName(f"{self.parent.name}-{self.index + 1}")
+    
+    @property
+    def title (self):
+        return f"{self.parent.title} ({self.position + 1}/{self.count})"
+    
+    @property
+    def contextName (self):
+        return self.parent.contextName + f"#{self.index + 1}"
+    
+    @property
+    def run (self):
+        return self.parent.run
+    
+    def render (self):
+        fn = self.filename
+        
+        self.run.log.d(f"Generating shard library '{fn}'.", self)
+        
+        return self.parent._library(fn, self._supplies, self.title, [i.name for i in self._supplies], self)
+
+
+# Rewrites the generated symbols and devicesets of an existing library line
+# by line. Elements are matched by name; anything else in the file (hand made
+# packages, symbols, settings, ...) is copied unchanged.
+class LibraryUpdate:
+    ELEMENT = re.compile(r'^\s*<(symbol|deviceset) name="([^"]*)"')
+    GENERATED = "&lt;b&gt;SUPPLY SYMBOL&lt;/b&gt;"
+    
+    def __init__ (self, fd, supplies, items, context):
+        self.fd = fd
+        self.context = context
+        self.items = "    " + Util.listItems(items) + "\n"
+        self.symbols = {}
+        self.devices = {}
+        
+        for supply in supplies:
+            self.symbols[supply.name] = supply.symbolData.lstrip("\n").rstrip() + "\n"
+            self.devices[supply.name] = supply.deviceData.lstrip("\n").rstrip() + "\n"
+    
+    def _elements (self):
+        # Yields (tag, name, lines) for each symbol/deviceset and
+        # (None, None, [line]) for everything in between.
+        lines = iter(self.fd)
+        for line in lines:
+            match = LibraryUpdate.ELEMENT.match(line)
+            if match is None:
+                yield None, None, [line]
+                continue
             
-            for supply in self.supplies:
-                symbols.write(supply.symbolData)
-                devices.write(supply.deviceData)
-                
-            fd.write(FILE_TEMPLATE.format(symbols=symbols.getvalue(),devices=devices.getvalue(), **params))
+            tag = match.group(1)
+            block = [line]
+            if not line.rstrip().endswith("/>"):
+                while f"</{tag}>" not in line:
+                    line = next(lines, None)
+                    if line is None:
+                        raise ValidationError(f"Library ends inside <{tag}> '{match.group(2)}'.", context = self.context)
+                    block.append(line)
+            yield tag, html.unescape(match.group(2)), block
+    
+    @staticmethod
+    def _normalize (lines):
+        return [i.strip() for i in lines if i.strip()]
+    
+    def _stale (self):
+        # Generated devicesets that are no longer part of the configuration
+        # are removed together with their symbol.
+        stale = set()
+        for tag, name, block in self._elements():
+            if tag == "deviceset" and name not in self.devices and LibraryUpdate.GENERATED in "".join(block):
+                stale.add(name)
+        self.fd.seek(0)
+        return stale
+    
+    def run (self):
+        stale = self._stale()
+        out = StringIO()
+        pending = {"symbol" : dict(self.symbols), "deviceset" : dict(self.devices)}
+        sections = {"</symbols>" : "symbol", "</devicesets>" : "deviceset"}
+        seen = set()
+        # Progress through the library description, whose supply list is
+        # generated: library -> description -> list -> done.
+        description = None
+        
+        for tag, name, block in self._elements():
+            if tag is None:
+                closing = block[0].strip()
+                if description is None and closing.startswith("<library"):
+                    description = "library"
+                elif description == "library":
+                    description = "description" if closing.startswith("<description") else "done"
+                elif description == "description" and closing.startswith("</description>"):
+                    description = "done"
+                elif description == "description" and closing == "&lt;ul&gt;":
+                    description = "list"
+                    out.write(block[0])
+                    out.write(self.items)
+                    continue
+                elif description == "list":
+                    if closing == "&lt;/ul&gt;":
+                        description = "done"
+                    else:
+                        continue
+                if closing in sections:
+                    section = sections[closing]
+                    seen.add(section)
+                    for data in pending[section].values():
+                        out.write(data)
+                    pending[section] = {}
+                out.write(block[0])
+            elif name in pending[tag]:
+                data = pending[tag].pop(name)
+                # Keep the existing text when only the indentation differs.
+                if LibraryUpdate._normalize(block) == LibraryUpdate._normalize(data.splitlines()):
+                    out.writelines(block)
+                else:
+                    out.write(data)
+            elif name in stale:
+                self.context.run.log.d(f"Removing {tag} '{name}'.", self.context)
+            else:
+                out.writelines(block)
+        
+        if len(seen) != 2:
+            raise ValidationError("Library does not contain <symbols> and <devicesets> sections.", context = self.context)
+        
+        return out.getvalue()
 
 
 class Config:
-    def __init__ (self, filename, basepath, prefix = ""):
+    def __init__ (self, filename, basepath, prefix = "", run = None):
+        self.run = run if run is not None else Run()
         self._groups = {}
         self.filename = filename
         self.prefix = prefix
         self._basepath = basepath
-        self.overwrite = False
-        L.d(f"Creating configuration from {self.filename}.", self)
+        self.shard = None
+        self.rules = []
+        self.run.log.d(f"Creating configuration from {self.filename}.", self)
         
     def createGroup (self, name, title):
         if name in self._groups:
@@ -661,89 +1047,633 @@ class Config:
     def contextName (self):
         return self.filename
         
-    def _makeFileName (self, name):
-        fn = os.path.join(self.basepath, self.prefix + name + ".lbr")
+    def _makeFileName (self, name, ext = ".lbr"):
+        fn = os.path.join(self.basepath, self.prefix + name + ext)
         return fn
         
     @property
     def basepath(self):
         return os.path.expanduser(self._basepath)
     
+    @property
+    def libraries (self):
+        # Library names as they appear in a schematic, including the groups
+        # scan rules may add supplies to.
+        return {self.prefix + i for i in chain(self._groups.keys(), (j["group"] for j in self.rules))}
+    
+    def restrict (self, used):
+        self.run.log.d(f"Restricting supplies to {len(used)} names in use.", self)
+        
+        used = {i.upper() for i in used}
+        known = set()
+        
+        # Groups from other configurations are shared, so copy the supplies
+        # in use instead of trimming them in place.
+        for group in self.groups:
+            if group.include is not None and group.include.parent is not self:
+                for supply in group.include.supplies:
+                    if supply.name.upper() in used and supply.name not in group._supplies:
+                        group._supplies[supply.name] = supply._clone(group)
+                group.include = None
+        
+        for group in self.groups:
+            for name in list(group._supplies.keys()):
+                if name.upper() in used:
+                    known.add(name.upper())
+                else:
+                    del group._supplies[name]
+        
+        # Names in use that aren't defined anywhere are picked up by the
+        # first matching rule.
+        for name in sorted(used - known):
+            for rule in self.rules:
+                if fnmatch.fnmatchcase(name, rule["match"].upper()):
+                    group = self._groups[rule["group"]] if rule["group"] in self._groups else self.createGroup(rule["group"], rule["group"])
+                    if name not in group._supplies:
+                        group.createSupply(name, rule["style"])
+                    break
+        
+        for name, group in list(self._groups.items()):
+            if next(iter(group.supplies), None) is None:
+                self.run.log.d(f"No supplies in use, skipping group.", group)
+                del self._groups[name]
+        
+        for group in self.groups:
+            if group.include is not None and group.include.name not in self._groups:
+                group.include = None
+    
     def validate (self):
-        L.d("Validating groups.", supplyConfig)
+        self.run.log.d("Validating groups.", self)
         for i in self.groups:
-            i.validate()
+            try:
+                i.validate()
+            except ValidationError as e:
+                self.run.fail(e)
             
     def write (self):
-        L.d("Generating libraries.", self)
+        self.run.log.d("Generating libraries.", self)
         for i in self.groups:
             i.write()
             
     @staticmethod
-    def parse (fd, overrideOutput = None):
-        fn          = fd.name
+    def _parseShard (value, context):
+        if value is None:
+            return None
         
-        L.d (f"Loading configuration from {fn}.")
+        if not type(value) is dict or len(value) != 1 or not ("supplies" in value or "bytes" in value):
+            raise ValidationError("Shard setting must be a dictionary with either 'supplies' or 'bytes'.", context = context)
         
-        data        = json.load(fd)
+        limit = next(iter(value.values()))
+        if not type(limit) is int or limit <= 0:
+            raise ValidationError("Shard limit must be a positive integer.", context = context)
+        
+        return value
+    
+    @staticmethod
+    def parse (fd, overrideOutput = None, overrideShard = None, run = None, filename = None):
+        fn          = filename if filename is not None else fd.name
+        start       = time.perf_counter()
+        run         = run if run is not None else Run()
+        
+        run.log.d (f"Loading configuration from {fn}.")
+        
+        text        = fd.read()
+        data        = json.loads(text)
         prefix      = data["prefix"] if "prefix" in data else ""
         out         = overrideOutput if ("output" not in data or overrideOutput is not None) else data["output"]
         
-        L.d (f"Configuration loaded.")
+        run.log.d (f"Configuration loaded.")
         
         if out is None:
             out = DEFAULT_FILE_PATH
             
-        config = Config(fn, out, prefix)
+        config = Config(fn, out, prefix, run)
+        
+        run.workspace.register(fn, Workspace.key(fn, text), config)
+        
+        try:
+            config.shard = Config._parseShard(overrideShard if overrideShard is not None else data.get("shard"), config)
+        except ValidationError as e:
+            run.fail(e)
         
         if "groups" not in data:
-            raise ValidationError("Configuration does not contain groups section.", context = config)
+            run.fail(ValidationError("Configuration does not contain groups section.", context = config))
+            return config
         
         if not type(data["groups"]) is dict:
-            raise ValidationError("Configuration contains invalid group value type. Should be dictionary.", context = config)
+            run.fail(ValidationError("Configuration contains invalid group value type. Should be dictionary.", context = config))
+            return config
         
-        # Decode groups and supply names
+        # Decode groups and supply names. When collecting errors, a problem
+        # only skips the offending group or supply.
         for k,v in data["groups"].items():
             if not type(v) is dict:
-                raise ValidationError(f"Group {k} is not a ditionary.", context = config)
+                run.fail(ValidationError(f"Group {k} is not a ditionary.", context = config))
+                continue
                 
             title = k if "title" not in v else v["title"]
             
             group = config.createGroup(k, title)
             
+            try:
+                group.shard = Config._parseShard(v.get("shard"), group)
+            except ValidationError as e:
+                run.fail(e)
+            
             if "supplies" not in v:
-                raise ValidationError("Configuration does not contain supplies section.", context = group)
+                run.fail(ValidationError("Configuration does not contain supplies section.", context = group))
+                continue
                 
             supplies = v["supplies"]
             
             if not isinstance(supplies, Iterable):
-                raise ValidationError("Configuration contains invalid supply list. Should be list.", context = group)
+                run.fail(ValidationError("Configuration contains invalid supply list. Should be list.", context = group))
+                continue
                 
             for supply in supplies:
-                if not type(supply) is dict:
-                    raise ValidationError("Configuration contains a supply that is malformed. Should be a dictionary.", context = group)
-                
-                if "name" not in supply:
-                    raise ValidationError("Configuration contains a supply that has no name.", context = group)
-                
-                if "style" not in supply:
-                    raise ValidationError("Configuration contains a supply without style.", context = group)
-                    
-                group.createSupply(supply["name"], supply["style"])
+                try:
+                    Config._parseSupply(group, supply)
+                except ValidationError as e:
+                    run.fail(e)
                 
+        if "rules" in data:
+            try:
+                config.rules = Config._parseRules(data["rules"], config)
+            except ValidationError as e:
+                run.fail(e)
+        
         # Connect group includes now that we've loaded all the groups
         for k,v in data["groups"].items():
-            if "include" in v:
+            if k in config._groups and "include" in v:
                 include = v["include"]
                 group = config._groups[k]
                 
+                # "file.json#group" refers to a group in another configuration
+                # relative to this one, loaded on first use.
+                if "#" in include:
+                    path, include = include.rsplit("#", 1)
+                    group._foreign = (os.path.normpath(os.path.join(os.path.dirname(fn), path)), include)
+                    run.log.d(f"Includes group '{include}' from '{path}' on first use.", group)
+                    continue
+                
                 if include not in config._groups:
-                    raise ValidationError(f"Group includes signals from group '{include}' but no such group exists.", context = group)
+                    run.fail(ValidationError(f"Group includes signals from group '{include}' but no such group exists.", context = group))
+                    continue
                 
                 group.include = config._groups[include]
-                L.d(f"Includes group '{group.include.contextName}'.", group)
-                
+                run.log.d(f"Includes group '{group.include.contextName}'.", group)
+        
+        run.log.d(f"Parsed {Config._countSupplies(config)} supplies in {time.perf_counter() - start:.3f}s.", config)
+        
         return config
+    
+    @staticmethod
+    def _parseRules (rules, context):
+        if not type(rules) is list:
+            raise ValidationError("Configuration contains invalid rules. Should be list.", context = context)
+        
+        for rule in rules:
+            if not type(rule) is dict:
+                raise ValidationError("Configuration contains a rule that is malformed. Should be a dictionary.", context = context)
+            
+            for key in ("match", "style", "group"):
+                if key not in rule:
+                    raise ValidationError(f"Configuration contains a rule without {key}.", context = context)
+            
+            if rule["style"] not in SUPPLY_SYM_TEMPLATES:
+                raise ValidationError(f"Rule '{rule['match']}' requested symbol style {rule['style']} which does not exist.", context = context)
+        
+        return rules
+    
+    @staticmethod
+    def _countSupplies (config):
+        return sum(len(i._supplies) for i in config.groups)
+    
+    @staticmethod
+    def _parseSupply (group, supply):
+        if not type(supply) is dict:
+            raise ValidationError("Configuration contains a supply that is malformed. Should be a dictionary.", context = group)
+        
+        if "name" not in supply:
+            raise ValidationError("Configuration contains a supply that has no name.", context = group)
+        
+        if "style" not in supply:
+            raise ValidationError("Configuration contains a supply without style.", context = group)
+            
+        return group.createSupply(supply["name"], supply["style"])
+    
+    TABLE_COLUMNS = ("group", "name", "style", "title")
+    
+    @staticmethod
+    def openTable (fn):
+        # Spreadsheet exports usually start with a byte order mark, and the
+        # csv module does its own newline handling.
+        return open(fn, 'r', encoding="utf-8-sig", newline="")
+    
+    @staticmethod
+    def parseTable (fd, overrideOutput = None, overrideShard = None, delimiter = ",", run = None):
+        fn          = fd.name
+        start       = time.perf_counter()
+        run         = run if run is not None else Run()
+        
+        run.log.d (f"Loading supply table from {fn}.")
+        
+        out = overrideOutput if overrideOutput is not None else DEFAULT_FILE_PATH
+        
+        config = Config(fn, out, run = run)
+        config.shard = Config._parseShard(overrideShard, config)
+        
+        reader = csv.DictReader(fd, delimiter=delimiter)
+        
+        if reader.fieldnames is None:
+            run.fail(ValidationError("Supply table is empty.", context = config))
+            return config
+        
+        reader.fieldnames = [i.strip() for i in reader.fieldnames]
+        
+        missing = [i for i in ("group", "name", "style") if i not in reader.fieldnames]
+        for column in missing:
+            run.fail(ValidationError(f"Supply table does not contain a '{column}' column.", context = config))
+        if len(missing) > 0:
+            return config
+        
+        # Rows are consumed one at a time; empty cells are treated as missing
+        # so they fail the same checks as absent keys in the JSON format.
+        for row in reader:
+            supply = {k : v.strip() for k,v in row.items() if k in Config.TABLE_COLUMNS and v and v.strip()}
+            
+            if "group" not in supply:
+                run.fail(ValidationError(f"Supply table row {reader.line_num} has no group.", context = config))
+                continue
+            
+            name = supply.pop("group")
+            title = supply.pop("title", None)
+            
+            # The title is taken from the first row of each group.
+            if name in config._groups:
+                group = config._groups[name]
+            else:
+                group = config.createGroup(name, title if title is not None else name)
+            
+            try:
+                Config._parseSupply(group, supply)
+            except ValidationError as e:
+                run.fail(e)
+        
+        run.log.d(f"Parsed {Config._countSupplies(config)} supplies in {time.perf_counter() - start:.3f}s.", config)
+        
+        return config
+
+
+CATALOG_PAGE_TEMPLATE="""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title_esc}</title>
+<style>
+body {{ font-family: sans-serif; }}
+figure {{ display: inline-block; margin: 8px; padding: 8px; border: 1px solid #ccc; text-align: center; }}
+figure img {{ display: block; margin: 0 auto 4px auto; }}
+</style>
+</head>
+<body>
+<h1>{title_esc}</h1>
+{items}
+</body>
+</html>
+"""
+
+CATALOG_ITEM_TEMPLATE="""<figure><img src="{src}" alt="{name_esc}"><figcaption>{name_esc}<br><small>{caption_esc}</small></figcaption></figure>
+"""
+
+CATALOG_MISSING_TEMPLATE="""<figure><figcaption>{name_esc}<br><small>{caption_esc} (no preview)</small></figcaption></figure>
+"""
+
+# Renders SVG previews of supply symbols from the wire, pin and text elements
+# of their templates. Previews are named by a hash of the style template and
+# supply name, so existing files are reused and only new entries are drawn.
+class Catalog:
+    VERSION     = "1"
+    SCALE       = 10
+    MARGIN      = 1.27
+    PIN_LENGTH  = {"point" : 0, "short" : 2.54, "middle" : 5.08, "long" : 7.62}
+    COLORS      = {"94" : "#9e2a2a", "96" : "#505050", "pin" : "#2a7a2a"}
+    DASHES      = {"longdash" : "1 0.5", "shortdash" : "0.5 0.5", "dashdot" : "1 0.4 0.2 0.4"}
+    ANCHOR      = {"left" : "start", "center" : "middle", "right" : "end"}
+    BASELINE    = {"bottom" : "auto", "center" : "central", "top" : "hanging"}
+    PREVIEW     = re.compile(r"[0-9a-f]{40}")
+    
+    def __init__ (self, run, path, jobs = None):
+        self.run = run
+        self.path = path
+        self.jobs = jobs
+    
+    @staticmethod
+    def key (style, name):
+        return hashlib.sha1("\0".join((Catalog.VERSION, SUPPLY_SYM_TEMPLATES[style], name)).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _fmt (value):
+        return f"{round(value, 4) + 0:g}"
+    
+    @staticmethod
+    def _render (symbol, name):
+        f = Catalog._fmt
+        items = []
+        points = []
+        
+        # Eagle's y axis points up, SVG's down.
+        for el in ET.fromstring(symbol.strip()):
+            if el.tag == "wire":
+                x1, y1, x2, y2 = (float(el.get(i)) for i in ("x1", "y1", "x2", "y2"))
+                dash = Catalog.DASHES.get(el.get("style"))
+                dash = f' stroke-dasharray="{dash}"' if dash is not None else ""
+                items.append(f'<line x1="{f(x1)}" y1="{f(-y1)}" x2="{f(x2)}" y2="{f(-y2)}" stroke="{Catalog.COLORS.get(el.get("layer"), "black")}" stroke-width="{el.get("width")}" stroke-linecap="round"{dash}/>')
+                points += [(x1, y1), (x2, y2)]
+            elif el.tag == "pin":
+                x, y = float(el.get("x")), float(el.get("y"))
+                angle = math.radians(float(el.get("rot", "R0")[1:]))
+                length = Catalog.PIN_LENGTH[el.get("length", "long")]
+                x2, y2 = x + length * math.cos(angle), y + length * math.sin(angle)
+                items.append(f'<line x1="{f(x)}" y1="{f(-y)}" x2="{f(x2)}" y2="{f(-y2)}" stroke="{Catalog.COLORS["pin"]}" stroke-width="0.15"/>')
+                items.append(f'<circle cx="{f(x)}" cy="{f(-y)}" r="0.3" fill="none" stroke="{Catalog.COLORS["pin"]}" stroke-width="0.1"/>')
+                points += [(x - 0.3, y - 0.3), (x + 0.3, y + 0.3), (x2, y2)]
+            elif el.tag == "text":
+                x, y, size = float(el.get("x")), float(el.get("y")), float(el.get("size"))
+                text = (el.text or "").replace(">VALUE", name).replace(">NAME", name)
+                align = el.get("align", "bottom-left")
+                vert, horz = ("center", "center") if align == "center" else align.split("-")
+                angle = float(el.get("rot", "R0")[1:])
+                
+                # Eagle keeps text readable: upside down text is drawn turned
+                # back by 180 degrees with its alignment mirrored.
+                if 90 < angle <= 270:
+                    angle -= 180
+                    horz = {"left" : "right", "right" : "left"}.get(horz, horz)
+                    vert = {"bottom" : "top", "top" : "bottom"}.get(vert, vert)
+                
+                rotate = f' transform="rotate({f(-angle)} {f(x)} {f(-y)})"' if angle != 0 else ""
+                items.append(f'<text x="{f(x)}" y="{f(-y)}" font-size="{f(size)}" font-family="sans-serif" fill="{Catalog.COLORS.get(el.get("layer"), "black")}" text-anchor="{Catalog.ANCHOR[horz]}" dominant-baseline="{Catalog.BASELINE[vert]}"{rotate}>{html.escape(text)}</text>')
+                
+                # Rough extent of the text for the view box.
+                w, h = len(text) * size * 0.7, size
+                x0 = {"left" : 0, "center" : -w / 2, "right" : -w}[horz]
+                y0 = {"bottom" : 0, "center" : -h / 2, "top" : -h}[vert]
+                c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+                for dx, dy in ((x0, y0), (x0 + w, y0), (x0, y0 + h), (x0 + w, y0 + h)):
+                    points.append((x + dx * c - dy * s, y + dx * s + dy * c))
+        
+        if len(points) == 0:
+            points = [(0, 0)]
+        
+        minx = min(i[0] for i in points) - Catalog.MARGIN
+        maxx = max(i[0] for i in points) + Catalog.MARGIN
+        miny = min(i[1] for i in points) - Catalog.MARGIN
+        maxy = max(i[1] for i in points) + Catalog.MARGIN
+        width, height = maxx - minx, maxy - miny
+        
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{f(minx)} {f(-maxy)} {f(width)} {f(height)}" '
+            f'width="{f(width * Catalog.SCALE)}" height="{f(height * Catalog.SCALE)}">\n'
+            + "".join(f"{i}\n" for i in items) + "</svg>\n")
+    
+    @staticmethod
+    def _renderBatch (batch):
+        # A symbol that can't be drawn must not take the rest of the batch
+        # down with it; failures are returned for the caller to report.
+        result = []
+        for key, symbol, name in batch:
+            try:
+                result.append((key, name, Catalog._render(symbol, name), None))
+            except (ET.ParseError, ValueError, KeyError) as e:
+                result.append((key, name, None, f"{e.__class__.__name__}: {e}"))
+        return result
+    
+    @staticmethod
+    def _pageName (name, used):
+        # Page names end up both on disk and in links, so keep them to
+        # characters that need no quoting.
+        base = re.sub(r"[^A-Za-z0-9+._-]", "_", name)
+        fn = base + ".html"
+        idx = 1
+        while fn in used:
+            idx += 1
+            fn = f"{base}-{idx}.html"
+        used.add(fn)
+        return fn
+    
+    def _page (self, fn, title, entries):
+        items = "".join((CATALOG_ITEM_TEMPLATE if os.path.exists(os.path.join(self.path, key + ".svg")) else CATALOG_MISSING_TEMPLATE).format(
+            src=quote(key + ".svg"),
+            name_esc=html.escape(name),
+            caption_esc=html.escape(caption)
+        ) for key, name, caption in entries)
+        
+        with open(os.path.join(self.path, fn), 'w') as fd:
+            fd.write(CATALOG_PAGE_TEMPLATE.format(title_esc=html.escape(title), items=items))
+    
+    def write (self, config):
+        os.makedirs(self.path, exist_ok=True)
+        
+        # One page per group plus one showing every style.
+        used = {"index.html", "styles.html"}
+        pages = [("styles.html", "Supply Styles", [(style, style, f"Style {style}") for style in SUPPLY_SYM_STYLES])]
+        for group in config.groups:
+            pages.append((Catalog._pageName(config.prefix + group.name, used), group.title, [(i.style, i.name, f"Style {i.style}") for i in group.supplies]))
+        
+        batches = []
+        queued = set()
+        for fn, title, entries in pages:
+            batch = []
+            for style, name, caption in entries:
+                key = Catalog.key(style, name)
+                if key in queued or os.path.exists(os.path.join(self.path, key + ".svg")):
+                    continue
+                queued.add(key)
+                batch.append((key, Supply.symbolFor(style, name), name))
+            if len(batch) > 0:
+                batches.append(batch)
+        
+        self.run.log.d(f"Rendering {len(queued)} previews in {len(batches)} batches.", config)
+        
+        rendered = 0
+        if len(batches) > 0:
+            with ProcessPoolExecutor(self.jobs) as pool:
+                for result in pool.map(Catalog._renderBatch, batches):
+                    for key, name, svg, error in result:
+                        if svg is None:
+                            self.run.log.w(f"Unable to render preview of '{name}'. ({error})", config)
+                            continue
+                        with open(os.path.join(self.path, key + ".svg"), 'w') as fd:
+                            fd.write(svg)
+                        rendered += 1
+        
+        for fn, title, entries in pages:
+            self._page(fn, title, [(Catalog.key(style, name), name, caption) for style, name, caption in entries])
+        
+        index = [f'<li><a href="{quote(fn)}">{html.escape(title)}</a></li>\n' for fn, title, entries in pages]
+        with open(os.path.join(self.path, "index.html"), 'w') as fd:
+            fd.write(CATALOG_PAGE_TEMPLATE.format(title_esc=html.escape(f"Catalog: {config.filename}"), items="<ul>\n" + "".join(index) + "</ul>"))
+        
+        # Previews are named by content hash, so ones for renamed or removed
+        # supplies would otherwise pile up. Other SVG files are left alone.
+        keys = {Catalog.key(style, name) for fn, title, entries in pages for style, name, caption in entries}
+        for fn in os.listdir(self.path):
+            key, ext = os.path.splitext(fn)
+            if ext == ".svg" and Catalog.PREVIEW.fullmatch(key) and key not in keys:
+                self.run.log.d(f"Removing unused preview '{fn}'.", config)
+                os.remove(os.path.join(self.path, fn))
+        
+        return rendered
+
+
+class Workspace:
+    def __init__ (self, run):
+        self.run = run
+        self._paths = {}
+        self._configs = {}
+    
+    @staticmethod
+    def key (fn, text):
+        # Relative includes resolve against the file's directory, so equal
+        # contents are only shared within one directory.
+        return os.path.dirname(os.path.abspath(fn)) + ":" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+    
+    def register (self, fn, key, config):
+        self._paths[os.path.abspath(fn)] = key
+        self._configs[key] = config
+    
+    def load (self, fn, context = None):
+        path = os.path.abspath(fn)
+        
+        if path in self._paths:
+            return self._configs[self._paths[path]]
+        
+        if not os.path.isfile(path):
+            raise ValidationError(f"Included configuration '{fn}' doesn't exist.", context = context)
+        
+        with open(path, 'r') as fd:
+            text = fd.read()
+        
+        key = Workspace.key(path, text)
+        if key in self._configs:
+            self.run.log.d(f"Configuration '{fn}' already loaded from '{self._configs[key].filename}'.", context)
+            self._paths[path] = key
+            return self._configs[key]
+        
+        self.run.log.d(f"Loading included configuration '{fn}'.", context)
+        try:
+            return Config.parse(StringIO(text), run = self.run, filename = fn)
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Included configuration '{fn}' is not valid JSON: {e.msg} at {e.lineno}:{e.colno}.", context = context)
+
+
+class Scanner:
+    EXTENSIONS = (".sch", )
+    
+    def __init__ (self, run, cachePath = None, jobs = None):
+        self.run = run
+        self.cachePath = cachePath
+        self.jobs = jobs
+        self._cache = {}
+        
+        if cachePath is not None and os.path.exists(cachePath):
+            # The cache is disposable; a damaged one only costs a rescan.
+            with open(cachePath, 'r') as fd:
+                try:
+                    self._cache = json.load(fd)
+                except json.JSONDecodeError as e:
+                    self.run.log.w(f"Ignoring damaged scan cache '{cachePath}'. ({e.msg})")
+            if not type(self._cache) is dict:
+                self.run.log.w(f"Ignoring damaged scan cache '{cachePath}'.")
+                self._cache = {}
+            self.run.log.d(f"Loaded {len(self._cache)} cached schematics from '{cachePath}'.")
+    
+    @staticmethod
+    def _files (paths):
+        for path in paths:
+            if os.path.isfile(path):
+                yield path
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fn in sorted(files):
+                    if os.path.splitext(fn)[1].lower() in Scanner.EXTENSIONS:
+                        yield os.path.join(root, fn)
+    
+    @staticmethod
+    def _hash (fn):
+        digest = hashlib.sha1()
+        with open(fn, 'rb') as fd:
+            for block in iter(lambda: fd.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _libraryPattern (libraries):
+        # Sharded groups are placed in "<library>-<n>".
+        return re.compile("(?:" + "|".join(re.escape(i) for i in sorted(libraries)) + r")(?:-\d+)?", re.IGNORECASE)
+    
+    @staticmethod
+    def _parse (fn, libraries):
+        # Only parts placed from the generated libraries count, together with
+        # the nets their supply pins are connected to. Parts are listed
+        # before the sheets, so nets can be matched while streaming.
+        # Returns (names, None), or (None, error) for a schematic that can't
+        # be read, such as the binary format used before Eagle 6.
+        pattern = Scanner._libraryPattern(libraries)
+        names = set()
+        parts = set()
+        connected = False
+        
+        try:
+            for event, elem in ET.iterparse(fn, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == "net":
+                        connected = False
+                    continue
+                
+                if elem.tag == "part":
+                    if pattern.fullmatch(elem.get("library", "")) and elem.get("deviceset") is not None:
+                        parts.add(elem.get("name"))
+                        names.add(elem.get("deviceset"))
+                elif elem.tag == "pinref":
+                    connected = connected or elem.get("part") in parts
+                elif elem.tag == "net":
+                    if connected and elem.get("name") is not None:
+                        names.add(elem.get("name"))
+                elem.clear()
+        except (ET.ParseError, OSError) as e:
+            return None, f"{e.__class__.__name__}: {e}"
+        return sorted(names), None
+    
+    def scan (self, paths, libraries):
+        # Results depend on the libraries being generated as well as the
+        # schematic itself.
+        libraries = sorted(libraries)
+        suffix = ":" + hashlib.sha1("\0".join(libraries).encode("utf-8")).hexdigest()
+        files = {fn : Scanner._hash(fn) + suffix for fn in Scanner._files(paths)}
+        pending = sorted({digest : fn for fn, digest in files.items() if digest not in self._cache}.items())
+        
+        self.run.log.d(f"Found {len(files)} schematics, {len(pending)} not cached.")
+        
+        if len(pending) > 0:
+            with ProcessPoolExecutor(self.jobs) as pool:
+                for (digest, fn), (names, error) in zip(pending, pool.map(Scanner._parse, [fn for digest, fn in pending], [libraries] * len(pending))):
+                    if names is None:
+                        self.run.log.w(f"Skipping schematic '{fn}'. ({error})")
+                        continue
+                    self.run.log.d(f"Scanned '{fn}' ({len(names)} names).")
+                    self._cache[digest] = names
+        
+        # Drop entries for schematics that no longer exist so the cache
+        # doesn't grow without bound.
+        self._cache = {digest : self._cache[digest] for digest in set(files.values()) if digest in self._cache}
+        
+        if self.cachePath is not None:
+            with open(self.cachePath, 'w') as fd:
+                json.dump(self._cache, fd, indent=1, sort_keys=True)
+        
+        return set(chain.from_iterable(self._cache.values()))
 
 
 parser = argparse.ArgumentParser(
@@ -755,7 +1685,7 @@ parser = argparse.ArgumentParser(
 parser.add_argument(
     'config',
     type=argparse.FileType('r'),
-    help="A JSON file containing a description of the supplies."
+    help="A JSON file containing a description of the supplies, or a CSV/TSV file (.csv, .tsv)\nwith group, name, style and optional title columns."
 )
 
 parser.add_argument(
@@ -782,61 +1712,179 @@ parser.add_argument(
     help="Create directory if needed."
 )
 
-args = parser.parse_args()
+shardOptions = parser.add_mutually_exclusive_group()
 
-if args.debug:
-    L.DEBUG=True
+shardOptions.add_argument(
+    '--shard-supplies',
+    type=int,
+    metavar='N',
+    help="Split each group into multiple libraries of roughly N supplies. Overrides 'shard' in json."
+)
 
-try:
-    supplyConfig = Config.parse(args.config, args.out)
-    
-    if args.force:
-        supplyConfig.overwrite = True
-        
-    L.i(f"Validating...")
-    supplyConfig.validate()
-    
-    if os.path.exists(supplyConfig.basepath):
-        if not os.path.isdir(supplyConfig.basepath):
-            raise ValidationError(f"Path '{supplyConfig.basepath}' must be a directory.", context = supplyConfig)
-    else:
-        if args.mkdir:
-            os.makedirs(supplyConfig.basepath)
+shardOptions.add_argument(
+    '--shard-bytes',
+    type=int,
+    metavar='N',
+    help="Split each group into multiple libraries of roughly N bytes. Overrides 'shard' in json."
+)
+
+parser.add_argument(
+    '--update',
+    action='store_true',
+    help="Update existing libraries in place. Only generated symbols and devicesets are replaced,\ninserted or removed; everything else in the library is kept."
+)
+
+parser.add_argument(
+    '--scan',
+    action='append',
+    metavar='PATH',
+    help="Only generate supplies placed from the generated libraries in the Eagle schematics (.sch)\nin PATH, and the nets connected to them. May be repeated.\nNames in use but not in the configuration are added using the json 'rules'."
+)
+
+parser.add_argument(
+    '--scan-cache',
+    metavar='FILE',
+    help="Cache of scanned schematics keyed by content hash. Defaults to '.gensupply-scan.json'\nin the output directory."
+)
+
+parser.add_argument(
+    '--jobs',
+    type=int,
+    help="Number of processes used to scan schematics. Defaults to the number of CPUs."
+)
+
+parser.add_argument(
+    '--check',
+    nargs='?',
+    const='text',
+    choices=('text', 'json'),
+    help="Only validate the configuration, reporting every problem found instead of stopping\nat the first one. With 'json' the report is written to stdout as JSON.\nExits with status 1 if any problem was found."
+)
+
+parser.add_argument(
+    '--catalog',
+    metavar='DIR',
+    help="Also render SVG previews of every style and supply into DIR with an HTML page per group.\nPreviews that already exist are not rendered again."
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    shardOverride = None
+    if args.shard_supplies is not None:
+        shardOverride = {"supplies" : args.shard_supplies}
+    elif args.shard_bytes is not None:
+        shardOverride = {"bytes" : args.shard_bytes}
+
+    run = Run(debug=args.debug, overwrite=args.force, update=args.update, collect=args.check is not None)
+    log = run.log
+
+    def report (fatal = None):
+        # Prints the problems found by --check, including an error that
+        # stopped the configuration from loading, and returns the exit code.
+        problems = [(i, i.context.contextName if i.context is not None else None, i.msg) for i in run.errors]
+        if isinstance(fatal, json.JSONDecodeError):
+            problems.append((fatal, args.config.name, f"{fatal.msg} at {fatal.lineno}:{fatal.colno}."))
+        elif isinstance(fatal, EagleGenError):
+            problems.append((fatal, fatal.context.contextName if fatal.context is not None else None, fatal.msg))
+        elif isinstance(fatal, OSError):
+            problems.append((fatal, fatal.filename, fatal.strerror if fatal.strerror is not None else str(fatal)))
+        elif fatal is not None:
+            problems.append((fatal, None, str(fatal)))
+
+        if args.check == "json":
+            json.dump({
+                "config"    : args.config.name,
+                "errors"    : [{
+                    "type"      : e.__class__.__name__,
+                    "context"   : context,
+                    "message"   : msg
+                } for e, context, msg in problems]
+            }, sys.stdout, indent=4)
+            sys.stdout.write("\n")
         else:
-            raise ValidationError(f"Path '{supplyConfig.basepath}' doesn't exist.", context = supplyConfig)
-            
-    L.i(f"Generating...")
-    supplyConfig.write()
-    
-    if len(supplyConfig.groups) > 0:
-        L.i(f"Successfully generated libraries:")
-        for i in supplyConfig.groups:
-            L.i(f"   {i.filename}")
-    
-    L.i(f"Successfully generated supplies.")
-except Exception as e:
-    if isinstance(e, json.JSONDecodeError):
-        L.e(f"Unable to load configuration due to a JSON parsing error.")
-        L.e(f"Cause:        {e.msg}")
-        L.e(f"Location:     {e.lineno}:{e.colno}")
-        L.e(f"File:         {args.config.name}")
-        
-        L.d(f"--Full Exception--", e.context)
-        L.d("".join(traceback.format_exception(None, e, e.__traceback__)), e.context)
-    elif isinstance(e, EagleGenError):
-        L.e(f"Error processing configuration.", e.context)
-        L.e(f"Cause:        {e.msg}", e.context)
-        
-        L.d(f"--Full Exception--", e.context)
-        L.d("".join(traceback.format_exception(None, e, e.__traceback__)), e.context)
-    elif isinstance(e, OSError):
-        L.e(f"I/O Error. ({errno})")
-        L.e(f"Cause:        {e.strerror}")
-        L.e(f"File:         {e.filename}")
-        
-        L.d(f"--Full Exception--", e.context)
-        L.d("".join(traceback.format_exception(None, e, e.__traceback__)), e.context)
-    else:
-        L.e(f"An exception occurred:")
-        L.e("".join(traceback.format_exception(None, e, e.__traceback__)))
+            for e, context, msg in problems:
+                if isinstance(e, EagleGenError):
+                    log.e(msg, e.context)
+                else:
+                    log.e(f"{context}: {msg}" if context is not None else msg)
+            log.i(f"Found {len(problems)} problem(s).")
+
+        return 1 if len(problems) > 0 else 0
+
+    try:
+        ext = os.path.splitext(args.config.name)[1].lower()
+        if ext in (".csv", ".tsv"):
+            args.config.close()
+            with Config.openTable(args.config.name) as fd:
+                supplyConfig = Config.parseTable(fd, args.out, shardOverride, delimiter="\t" if ext == ".tsv" else ",", run=run)
+        else:
+            supplyConfig = Config.parse(args.config, args.out, shardOverride, run=run)
+
+        if args.check is not None:
+            supplyConfig.validate()
+            sys.exit(report())
+
+        if os.path.exists(supplyConfig.basepath):
+            if not os.path.isdir(supplyConfig.basepath):
+                raise ValidationError(f"Path '{supplyConfig.basepath}' must be a directory.", context = supplyConfig)
+        else:
+            if args.mkdir:
+                os.makedirs(supplyConfig.basepath)
+            else:
+                raise ValidationError(f"Path '{supplyConfig.basepath}' doesn't exist.", context = supplyConfig)
+
+        if args.scan is not None:
+            log.i(f"Scanning schematics...")
+            cachePath = args.scan_cache if args.scan_cache is not None else os.path.join(supplyConfig.basepath, ".gensupply-scan.json")
+            supplyConfig.restrict(Scanner(supplyConfig.run, cachePath, args.jobs).scan(args.scan, supplyConfig.libraries))
+
+        log.i(f"Validating...")
+        supplyConfig.validate()
+
+        log.i(f"Generating...")
+        supplyConfig.write()
+
+        if len(supplyConfig.groups) > 0:
+            log.i(f"Successfully generated libraries:")
+            for i in supplyConfig.groups:
+                if i.shardLimit is not None:
+                    log.i(f"   {i.indexFilename}")
+                else:
+                    log.i(f"   {i.filename}")
+
+        if args.catalog is not None:
+            log.i(f"Rendering catalog...")
+            count = Catalog(run, args.catalog, args.jobs).write(supplyConfig)
+            log.i(f"Rendered {count} new previews into '{args.catalog}'.")
+
+        log.i(f"Successfully generated supplies.")
+    except Exception as e:
+        if args.check is not None:
+            log.d("".join(traceback.format_exception(None, e, e.__traceback__)))
+            sys.exit(report(e))
+        elif isinstance(e, json.JSONDecodeError):
+            log.e(f"Unable to load configuration due to a JSON parsing error.")
+            log.e(f"Cause:        {e.msg}")
+            log.e(f"Location:     {e.lineno}:{e.colno}")
+            log.e(f"File:         {args.config.name}")
+
+            log.d(f"--Full Exception--")
+            log.d("".join(traceback.format_exception(None, e, e.__traceback__)))
+        elif isinstance(e, EagleGenError):
+            log.e(f"Error processing configuration.", e.context)
+            log.e(f"Cause:        {e.msg}", e.context)
+
+            log.d(f"--Full Exception--", e.context)
+            log.d("".join(traceback.format_exception(None, e, e.__traceback__)), e.context)
+        elif isinstance(e, OSError):
+            log.e(f"I/O Error. ({e.errno})")
+            log.e(f"Cause:        {e.strerror}")
+            log.e(f"File:         {e.filename}")
+
+            log.d(f"--Full Exception--")
+            log.d("".join(traceback.format_exception(None, e, e.__traceback__)))
+        else:
+            log.e(f"An exception occurred:")
+            log.e("".join(traceback.format_exception(None, e, e.__traceback__)))
 
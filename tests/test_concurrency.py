@@ -0,0 +1,59 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+spec = importlib.util.spec_from_file_location("gensupply", os.path.join(ROOT, "eagle-gensupply.py"))
+gensupply = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gensupply)
+
+with open(os.path.join(ROOT, "examples", "example.json")) as fd:
+    EXAMPLE = json.load(fd)
+
+def generate (base, i):
+    # Alternate debug logging and sharding so concurrent runs differ in
+    # their per-run options.
+    fd = io.StringIO(json.dumps(dict(EXAMPLE, prefix=f"p{i}_")))
+    fd.name = f"cfg{i}.json"
+    out = os.path.join(base, str(i))
+    os.makedirs(out)
+    
+    stream = io.StringIO()
+    run = gensupply.Run(debug=(i % 2 == 0), overwrite=True, stream=stream)
+    config = gensupply.Config.parse(fd, out, {"supplies" : 2} if i % 3 == 0 else None, run=run)
+    config.validate()
+    config.write()
+    
+    files = {}
+    for fn in sorted(os.listdir(out)):
+        with open(os.path.join(out, fn), 'rb') as f:
+            files[fn] = hashlib.sha1(f.read()).hexdigest()
+    return files, stream.getvalue()
+
+def test_concurrent_generation (tmp_path):
+    count = 200
+    
+    with ThreadPoolExecutor(32) as pool:
+        parallel = list(pool.map(lambda i: generate(str(tmp_path / "parallel"), i), range(count)))
+    serial = [generate(str(tmp_path / "serial"), i) for i in range(count)]
+    
+    for i, ((files, log), (expected, _)) in enumerate(zip(parallel, serial)):
+        assert files == expected
+        # Each run logs only about its own configuration, and only when its
+        # own debug option is set.
+        assert ("[Debug" in log) == (i % 2 == 0)
+        for line in log.splitlines():
+            if "cfg" in line:
+                assert f"cfg{i}.json" in line
+
+def test_templates_are_read_only ():
+    with pytest.raises(TypeError):
+        gensupply.SUPPLY_SYM_TEMPLATES["NEW"] = ""
+    with pytest.raises(TypeError):
+        gensupply.SUPPLY_SYM_ALIAS["NEW"] = ()
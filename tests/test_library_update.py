@@ -0,0 +1,124 @@
+import importlib.util
+import io
+import json
+import os
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+spec = importlib.util.spec_from_file_location("gensupply", os.path.join(ROOT, "eagle-gensupply.py"))
+gensupply = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gensupply)
+
+SUPPLIES = [
+    {"name":"Gnd", "style":"F-"},
+    {"name":"Vcc", "style":"F+"},
+]
+
+PACKAGE = """<package name="HAND">
+<smd name="1" x="0" y="0" dx="1" dy="1" layer="1"/>
+</package>
+"""
+
+SYMBOL = """<symbol name="HAND">
+<pin name="P" x="0" y="0" length="short"/>
+</symbol>
+"""
+
+DEVICESET = """<deviceset name="HAND">
+<description>Drawn by hand.</description>
+<gates>
+<gate name="G$1" symbol="HAND" x="0" y="0"/>
+</gates>
+</deviceset>
+"""
+
+def generate (path, supplies, update = True):
+    fd = io.StringIO(json.dumps({"prefix" : "t_", "groups" : {"g" : {"title" : "G", "supplies" : supplies}}}))
+    fd.name = "update.json"
+    run = gensupply.Run(overwrite=True, update=update, stream=io.StringIO())
+    config = gensupply.Config.parse(fd, str(path), run=run)
+    config.validate()
+    config.write()
+    return read(path)
+
+def read (path):
+    with open(os.path.join(path, "t_g.lbr"), 'r') as fd:
+        return fd.read()
+
+def edit (path, old, new):
+    data = read(path)
+    assert old in data
+    with open(os.path.join(path, "t_g.lbr"), 'w') as fd:
+        fd.write(data.replace(old, new, 1))
+    return read(path)
+
+def block (data, tag, name):
+    start = data.index(f'<{tag} name="{name}"')
+    return data[start:data.index(f"</{tag}>", start)]
+
+def handAdded (path):
+    generate(path, SUPPLIES)
+    edit(path, "<packages>\n", "<packages>\n" + PACKAGE)
+    edit(path, "<symbols>\n", "<symbols>\n" + SYMBOL)
+    return edit(path, "</devicesets>\n", DEVICESET + "</devicesets>\n")
+
+def test_unchanged_library_is_kept (tmp_path):
+    fresh = generate(tmp_path, SUPPLIES, update=False)
+    assert generate(tmp_path, SUPPLIES) == fresh
+
+    edited = handAdded(tmp_path)
+    assert generate(tmp_path, SUPPLIES) == edited
+
+def test_replace (tmp_path):
+    fresh = generate(tmp_path, SUPPLIES, update=False)
+    # A changed generated symbol is restored exactly, indentation included.
+    edit(tmp_path, '<wire x1="1.905"', '<wire x1="9.999"')
+    assert generate(tmp_path, SUPPLIES) == fresh
+
+def test_reindented_symbol_is_kept (tmp_path):
+    generate(tmp_path, SUPPLIES)
+    edited = edit(tmp_path, '        <symbol name="Gnd">', '<symbol name="Gnd">')
+    assert generate(tmp_path, SUPPLIES) == edited
+
+def test_insert_and_remove (tmp_path):
+    handAdded(tmp_path)
+    supplies = [SUPPLIES[0], {"name":"Vee", "style":"F-"}]
+    data = generate(tmp_path, supplies)
+
+    for tag in ("symbol", "deviceset"):
+        assert f'<{tag} name="Vcc"' not in data
+        assert f'<{tag} name="Vee"' in data
+        assert f'<{tag} name="Gnd"' in data
+    assert PACKAGE in data
+    assert SYMBOL in data
+    assert DEVICESET in data
+
+    # New supplies go at the end of their section.
+    assert data.index('<symbol name="Vee"') < data.index("</symbols>")
+    assert data.index('<deviceset name="Vee"') > data.index('<deviceset name="HAND"')
+    (tmp_path / "fresh").mkdir()
+    assert block(data, "symbol", "Vee") == block(generate(tmp_path / "fresh", supplies, update=False), "symbol", "Vee")
+
+def test_description_list (tmp_path):
+    generate(tmp_path, SUPPLIES)
+    data = generate(tmp_path, SUPPLIES + [{"name":"Vee", "style":"F-"}])
+    description = data[data.index("<description>"):data.index("</description>")]
+    assert "&lt;li&gt;Gnd&lt;/li&gt;&lt;li&gt;Vcc&lt;/li&gt;&lt;li&gt;Vee&lt;/li&gt;" in description
+    assert description.count("&lt;ul&gt;") == 1
+
+    data = generate(tmp_path, SUPPLIES[:1])
+    description = data[data.index("<description>"):data.index("</description>")]
+    assert "&lt;li&gt;Gnd&lt;/li&gt;\n" in description
+    assert "Vcc" not in description
+
+@pytest.mark.parametrize("section", ["symbols", "devicesets"])
+def test_missing_section (tmp_path, section):
+    generate(tmp_path, SUPPLIES)
+    data = read(tmp_path)
+    start = data.index(f"<{section}>")
+    edit(tmp_path, data[start:data.index(f"</{section}>") + len(section) + 4], "")
+
+    with pytest.raises(gensupply.ValidationError):
+        generate(tmp_path, SUPPLIES)